@@ -1,11 +1,17 @@
 """
 Handlers for admin-only bot commands.
 """
+import asyncio
 import os
 import logging
-from telegram import Update
+from datetime import datetime, timedelta
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import TelegramError
 from telegram.ext import ContextTypes
+from utils import log_index
 from utils.auth import admin_only
+from utils.broadcast import AUDIENCES, AUDIENCE_ALL, fan_out, select_recipients, start_background
+from utils.time_utils import get_shift_date
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -13,6 +19,15 @@ logger = logging.getLogger(__name__)
 # The log file name must match the one in utils/logger.py
 LOG_FILE = 'work_tracker_log.csv'
 
+# --- Broadcast Settings ---
+PROGRESS_EVERY_CHUNKS = 4  # Edit the progress message every N chunks
+MAX_FAILURES_LISTED = 10
+SUMMARY_TIMEOUT_SECONDS = 5
+
+# --- History Query Settings ---
+HISTORY_PAGE_SIZE = 10
+DEFAULT_HISTORY_DAYS = 30
+
 @admin_only
 async def get_log_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -40,3 +55,209 @@ async def get_log_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Failed to send log file to admin {user.id}: {e}")
         await update.message.reply_text("An error occurred while trying to send the log file.")
 
+
+
+async def _send_broadcast_summary(context: ContextTypes.DEFAULT_TYPE, admin_chat_id: int, heading: str, result: dict, total: int):
+    """Sends the admin the sent/failed counts of a finished or interrupted broadcast."""
+    summary_lines = [
+        heading,
+        f"✅ Sent: {result['sent']}/{total}",
+        f"❌ Failed: {len(result['failed'])}",
+    ]
+    if result['done'] < total:
+        summary_lines.append(f"⏸️ Not attempted: {total - result['done']}")
+    for user_id, reason in list(result['failed'].items())[:MAX_FAILURES_LISTED]:
+        summary_lines.append(f"• {user_id}: {reason}")
+    if len(result['failed']) > MAX_FAILURES_LISTED:
+        summary_lines.append(f"...and {len(result['failed']) - MAX_FAILURES_LISTED} more.")
+
+    await context.bot.send_message(chat_id=admin_chat_id, text="\n".join(summary_lines))
+
+
+async def _run_broadcast(context: ContextTypes.DEFAULT_TYPE, admin_chat_id: int, status_message, recipients: list, text: str):
+    """Runs the fan-out in the background and keeps the admin informed."""
+    chunks_done = 0
+    result = {'sent': 0, 'failed': {}, 'done': 0}
+
+    async def report_progress(done: int, total: int):
+        nonlocal chunks_done
+        chunks_done += 1
+        if chunks_done % PROGRESS_EVERY_CHUNKS == 0 and done < total:
+            await status_message.edit_text(f"📣 Broadcasting... {done}/{total} processed.")
+
+    try:
+        await fan_out(context.bot, recipients, text, progress_callback=report_progress, result=result)
+    except asyncio.CancelledError:
+        # Cancelled by lifecycle.shutdown(); tell the admin how far we got, but don't hold up the exit.
+        try:
+            await asyncio.wait_for(
+                _send_broadcast_summary(context, admin_chat_id, "📣 Broadcast interrupted by shutdown", result, len(recipients)),
+                timeout=SUMMARY_TIMEOUT_SECONDS
+            )
+        except (asyncio.TimeoutError, TelegramError) as e:
+            logger.warning(f"Could not send the interrupted broadcast summary: {e}")
+        raise
+
+    await _send_broadcast_summary(context, admin_chat_id, "📣 Broadcast finished", result, len(recipients))
+
+
+@admin_only
+async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Sends a message to all authorized users, or to a filtered audience.
+    Usage: /broadcast [all|working|on_break|not_started] <message>
+    The message keeps its line breaks and spacing.
+    """
+    user = update.effective_user
+
+    # Take the text after the command as typed; context.args would collapse newlines.
+    parts = (update.message.text or "").split(maxsplit=1)
+    text = parts[1] if len(parts) > 1 else ""
+
+    audience = AUDIENCE_ALL
+    words = text.split(maxsplit=1)
+    if words and words[0].lower() in AUDIENCES:
+        audience = words[0].lower()
+        text = words[1] if len(words) > 1 else ""
+
+    text = text.strip()
+    if not text:
+        await update.message.reply_text(
+            "Usage: /broadcast [all|working|on_break|not_started] <message>"
+        )
+        return
+
+    recipients = select_recipients(context.application, audience)
+    if not recipients:
+        await update.message.reply_text(f"No users match the audience '{audience}'.")
+        return
+
+    logger.info(f"Admin user {user.id} started a broadcast to {len(recipients)} user(s) ({audience}).")
+    status_message = await update.message.reply_text(
+        f"📣 Broadcasting to {len(recipients)} user(s) ({audience})..."
+    )
+
+    # Run in the background so the bot keeps answering other users meanwhile.
+    start_background(_run_broadcast(context, update.effective_chat.id, status_message, recipients, text))
+
+
+# --- Historical Queries ---
+def _parse_date(text: str):
+    """Parses YYYY-MM-DD or DD-MM-YYYY into a 'YYYY-MM-DD' string, or returns None."""
+    for fmt in ('%Y-%m-%d', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(text, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+
+def _render_page(title: str, offsets: list, page: int, callback_prefix: str, format_row):
+    """Builds the text and Prev/Next keyboard for one page of indexed log rows."""
+    total_pages = max(1, -(-len(offsets) // HISTORY_PAGE_SIZE))
+    page = min(max(page, 0), total_pages - 1)
+    page_offsets = offsets[page * HISTORY_PAGE_SIZE:(page + 1) * HISTORY_PAGE_SIZE]
+
+    lines = [title, f"Page {page + 1}/{total_pages} ({len(offsets)} records)", "------------------------------------"]
+    lines.extend(format_row(row) for row in log_index.read_rows(page_offsets))
+    if not page_offsets:
+        lines.append("No records found.")
+
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton("◀️ Prev", callback_data=f"{callback_prefix}:{page - 1}"))
+    if page < total_pages - 1:
+        buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f"{callback_prefix}:{page + 1}"))
+    reply_markup = InlineKeyboardMarkup([buttons]) if buttons else None
+
+    return "\n".join(lines), reply_markup
+
+
+def _format_history_row(row: list) -> str:
+    """One line of /history output."""
+    return f"{row[0][:19].replace('T', ' ')} | {row[3]} | {row[4]}"
+
+
+def _format_late_row(row: list) -> str:
+    """One line of /late output."""
+    return f"{row[2]} ({row[1]}) | {row[0][11:19]} | {row[4]}"
+
+
+def _history_page(user_id: str, since_date: str, page: int):
+    """Renders one page of a user's history."""
+    offsets = log_index.user_history(user_id, since_date)
+    title = f"📜 History for {user_id} since {since_date}"
+    return _render_page(title, offsets, page, f"hist:{user_id}:{since_date}", _format_history_row)
+
+
+def _late_page(shift_date: str, page: int):
+    """Renders one page of late check-ins for a shift date."""
+    offsets = log_index.late_checkins(shift_date)
+    title = f"⏰ Late check-ins on {shift_date}"
+    return _render_page(title, offsets, page, f"late:{shift_date}", _format_late_row)
+
+
+@admin_only
+async def history(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Shows a user's recent activity, newest first.
+    Usage: /history <user_id|username> [days]
+    """
+    args = context.args or []
+    if not args:
+        await update.message.reply_text("Usage: /history <user_id|username> [days]")
+        return
+
+    days = DEFAULT_HISTORY_DAYS
+    if len(args) > 1 and args[-1].rstrip('dD').isdigit():
+        days = int(args[-1].rstrip('dD'))
+        args = args[:-1]
+
+    user_id = log_index.resolve_user(" ".join(args))
+    if not user_id:
+        await update.message.reply_text(f"No log records found for '{' '.join(args)}'.")
+        return
+
+    since_date = (get_shift_date() - timedelta(days=days)).strftime('%Y-%m-%d')
+    text, reply_markup = _history_page(user_id, since_date, 0)
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+
+@admin_only
+async def late(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Lists everyone who checked in late on a shift date (today's shift by default).
+    Usage: /late [YYYY-MM-DD]
+    """
+    args = context.args or []
+    if args:
+        shift_date = _parse_date(args[0])
+        if not shift_date:
+            await update.message.reply_text("Usage: /late [YYYY-MM-DD]")
+            return
+    else:
+        shift_date = get_shift_date().strftime('%Y-%m-%d')
+
+    text, reply_markup = _late_page(shift_date, 0)
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+
+@admin_only
+async def history_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handles the Prev/Next buttons of /history and /late results."""
+    query = update.callback_query
+    await query.answer()
+
+    parts = query.data.split(':')
+    try:
+        if parts[0] == 'hist':
+            text, reply_markup = _history_page(parts[1], parts[2], int(parts[3]))
+        elif parts[0] == 'late':
+            text, reply_markup = _late_page(parts[1], int(parts[2]))
+        else:
+            return
+    except (IndexError, ValueError) as e:
+        logger.error(f"Invalid history callback data {query.data!r}: {e}")
+        return
+
+    await query.edit_message_text(text, reply_markup=reply_markup)
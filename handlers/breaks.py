@@ -6,13 +6,11 @@ from datetime import timedelta
 from utils.time_utils import get_current_time, format_duration
 from utils.keyboards import on_break_keyboard, main_keyboard
 from utils.logger import log_activity
+from utils.states import SELECTING_ACTION, ON_BREAK
 
 # --- Setup Logging ---
 logger = logging.getLogger(__name__)
 
-# --- State Definitions (ensure these match main.py) ---
-SELECTING_ACTION, ON_BREAK, CONFIRM_OFF_WORK = range(3)
-
 # --- Constants ---
 MAX_TOILET_BREAKS = 6
 TOILET_BREAK_LIMIT_SECONDS = 10 * 60  # 10 minutes
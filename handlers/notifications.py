@@ -0,0 +1,95 @@
+"""
+Scheduled team-wide notifications sent through the JobQueue.
+"""
+import asyncio
+import logging
+from datetime import time
+
+from telegram import Bot
+from telegram.ext import ContextTypes, JobQueue
+
+from handlers.work import WORK_START_HOUR, WORK_START_MINUTE
+from utils.broadcast import AUDIENCE_NOT_STARTED, AUDIENCE_WORKING, fan_out, select_recipients, start_background
+from utils.time_utils import TIMEZONE
+
+# --- Setup Logging ---
+logger = logging.getLogger(__name__)
+
+# --- Schedule (local time, see utils/time_utils.TIMEZONE) ---
+DINNER_WINDOW_HOUR = 22
+DINNER_WINDOW_MINUTE = 0
+# The shift ends at midnight; anyone still checked in half an hour later most likely forgot.
+CHECKOUT_NUDGE_HOUR = 0
+CHECKOUT_NUDGE_MINUTE = 30
+
+# Each entry: (job name, hour, minute, audience, message)
+TEAM_NOTIFICATIONS = [
+    (
+        'team_shift_start',
+        WORK_START_HOUR, WORK_START_MINUTE,
+        AUDIENCE_NOT_STARTED,
+        "⏰ Your shift starts now. Please tap 🚀 Start Work to check in.",
+    ),
+    (
+        'team_dinner_window',
+        DINNER_WINDOW_HOUR, DINNER_WINDOW_MINUTE,
+        AUDIENCE_WORKING,
+        "🍔 The dinner break window is now open (22:00 - 22:30).",
+    ),
+    (
+        'team_checkout_nudge',
+        CHECKOUT_NUDGE_HOUR, CHECKOUT_NUDGE_MINUTE,
+        AUDIENCE_WORKING,
+        "👋 You are still checked in. Did you forget to tap Off Work?",
+    ),
+]
+
+
+async def send_team_notification(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """JobQueue callback that fans a scheduled message out to its audience."""
+    job = context.job
+    try:
+        audience = job.data['audience']
+        message = job.data['message']
+    except (KeyError, TypeError) as e:
+        logger.error(f"Error in send_team_notification: Could not retrieve data from job. {e}")
+        return
+
+    recipients = select_recipients(context.application, audience)
+    if not recipients:
+        logger.info(f"Scheduled notification {job.name}: no recipients ({audience}).")
+        return
+
+    # Runs outside the JobQueue so lifecycle.shutdown() can cancel it like an admin broadcast.
+    start_background(_run_team_notification(context.bot, job.name, recipients, message))
+
+
+async def _run_team_notification(bot: Bot, name: str, recipients: list, message: str) -> None:
+    """Fans one scheduled message out and logs the outcome, including partial progress on shutdown."""
+    result = {'sent': 0, 'failed': {}, 'done': 0}
+    try:
+        await fan_out(bot, recipients, message, result=result)
+    except asyncio.CancelledError:
+        logger.warning(
+            f"Scheduled notification {name} interrupted by shutdown: sent {result['sent']}/{len(recipients)}, "
+            f"{len(result['failed'])} failed, {len(recipients) - result['done']} not attempted."
+        )
+        raise
+    logger.info(
+        f"Scheduled notification {name}: sent {result['sent']}/{len(recipients)}, "
+        f"{len(result['failed'])} failed."
+    )
+
+
+def schedule_team_notifications(job_queue: JobQueue) -> None:
+    """Registers the daily team notifications. Safe to call on every boot."""
+    for name, hour, minute, audience, message in TEAM_NOTIFICATIONS:
+        for job in job_queue.get_jobs_by_name(name):
+            job.schedule_removal()
+        job_queue.run_daily(
+            send_team_notification,
+            time=time(hour=hour, minute=minute, tzinfo=TIMEZONE),
+            data={'audience': audience, 'message': message},
+            name=name
+        )
+    logger.info(f"Scheduled {len(TEAM_NOTIFICATIONS)} daily team notification(s).")
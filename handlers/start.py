@@ -3,14 +3,12 @@ from telegram.ext import ContextTypes, ConversationHandler
 
 from utils.auth import restricted
 from utils.keyboards import main_keyboard
+from utils.states import SELECTING_ACTION
 import logging
 
 # --- Setup Logging ---
 logger = logging.getLogger(__name__)
 
-# --- State Definitions ---
-SELECTING_ACTION, ON_BREAK = range(2)
-
 @restricted
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Starts the bot, displays a welcome message, and clears old data."""
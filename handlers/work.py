@@ -6,13 +6,11 @@ from datetime import timedelta
 from utils.time_utils import get_current_time, get_shift_date, format_duration
 from utils.keyboards import main_keyboard, confirmation_keyboard
 from utils.logger import log_activity
+from utils.states import SELECTING_ACTION, ON_BREAK, CONFIRM_OFF_WORK
 
 # --- Setup Logging ---
 logger = logging.getLogger(__name__)
 
-# --- State Definitions ---
-SELECTING_ACTION, ON_BREAK, CONFIRM_OFF_WORK = range(3)
-
 # --- Constants ---
 WORK_START_HOUR = 11
 WORK_START_MINUTE = 0
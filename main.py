@@ -2,21 +2,9 @@ import asyncio
 import logging
 import os
 
-from telegram import Update
-from telegram.ext import (
-    Application,
-    CommandHandler,
-    ContextTypes,
-    ConversationHandler,
-    MessageHandler,
-    filters,
-    PicklePersistence,
-)
-
-from aiohttp import web
-
-# --- Import your custom handlers ---
-from handlers import start, work, breaks, admin
+# Imported first: it only needs the standard library and starts the boot clock.
+from utils import startup
+from utils.states import SELECTING_ACTION, ON_BREAK, CONFIRM_OFF_WORK
 
 # --- Setup Logging ---
 logging.basicConfig(
@@ -25,15 +13,22 @@ logging.basicConfig(
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
-# --- State Definitions for ConversationHandler ---
-SELECTING_ACTION, ON_BREAK, CONFIRM_OFF_WORK = range(3)
+# Heavy imports (telegram, handlers, persistence) are deferred until after the
+# health endpoint is up, and run in a worker thread so the event loop keeps
+# answering Render's probe while they load.
+DEFERRED_MODULES = [
+    'handlers.admin', 'handlers.notifications',
+    'utils.anomaly', 'utils.auth',
+]
 
 
 # --- Web Server Part (to keep Render service alive) ---
 async def health_check(request):
+    from aiohttp import web
     return web.Response(text="Health check: OK, I am alive!")
 
 async def run_web_server(port):
+    web = startup.import_module('aiohttp.web')
     app = web.Application()
     app.router.add_get('/', health_check)
     runner = web.AppRunner(app)
@@ -42,29 +37,55 @@ async def run_web_server(port):
     logger.info(f"Starting web server on port {port}...")
     await site.start()
     logger.info("Web server started successfully.")
+    return runner
 
 
-# --- Main Application Logic ---
-async def main() -> None:
-    TOKEN = os.getenv("BOT_TOKEN")
-    if not TOKEN:
-        logger.critical("FATAL: BOT_TOKEN environment variable not set!")
-        return
+def _import_modules(names: list) -> None:
+    """Imports the given modules (meant to run in a worker thread via asyncio.to_thread)."""
+    for name in names:
+        startup.import_module(name)
 
-    PORT = int(os.environ.get("PORT", 8080))
+
+def _preload_persistence(persistence) -> None:
+    """
+    Reads and unpickles the persistence file. Runs in a worker thread: the
+    getters only touch the file when their data is not loaded yet, so the later
+    application.initialize() call just copies what is already in memory.
+    """
+    asyncio.run(persistence.get_user_data())
+
+
+def build_application(token: str):
+    """
+    Builds the Application with persistence and the conversation handler (critical path only).
+    Runs in a worker thread: importing telegram and the handlers, and creating the
+    HTTP client, take a few hundred milliseconds that would otherwise block the loop.
+    """
+    telegram_ext = startup.import_module('telegram.ext')
+    Update = startup.import_module('telegram').Update
+    start = startup.import_module('handlers.start')
+    work = startup.import_module('handlers.work')
+    breaks = startup.import_module('handlers.breaks')
+    dedup = startup.import_module('utils.dedup')
+
+    CommandHandler = telegram_ext.CommandHandler
+    MessageHandler = telegram_ext.MessageHandler
+    filters = telegram_ext.filters
 
     # --- Setup Persistence ---
-    persistence = PicklePersistence(filepath="bot_persistence")
+    # The file is read later, by _preload_persistence() in a worker thread.
+    persistence = telegram_ext.PicklePersistence(filepath="bot_persistence")
 
-    application = (
-        Application.builder()
-        .token(TOKEN)
-        .persistence(persistence)
-        .build()
-    )
+    with startup.timed("build application"):
+        application = (
+            telegram_ext.Application.builder()
+            .token(token)
+            .persistence(persistence)
+            .build()
+        )
 
     # --- Setup Conversation Handler with Persistence ---
-    conv_handler = ConversationHandler(
+    conv_handler = telegram_ext.ConversationHandler(
         entry_points=[CommandHandler('start', start.start)],
         states={
             SELECTING_ACTION: [
@@ -88,18 +109,102 @@ async def main() -> None:
         name="main_conversation_handler" # A unique name for the handler
     )
 
+    # --- Drop redelivered updates and double-taps before any handler runs ---
+    application.add_handler(telegram_ext.TypeHandler(Update, dedup.drop_duplicate_updates), group=-1)
     application.add_handler(conv_handler)
+
+    # --- Measure cold start: runs after the conversation handler has answered ---
+    # (record_first_update ignores every call after the first one.)
+    async def track_first_update(update, context):
+        startup.record_first_update(context.bot_data)
+
+    application.add_handler(telegram_ext.TypeHandler(object, track_first_update), group=99)
+
+    return application
+
+
+async def finish_startup(application) -> None:
+    """Non-critical setup, run in the background once the bot is already polling."""
+    with startup.timed("deferred imports (worker thread)"):
+        await asyncio.to_thread(_import_modules, DEFERRED_MODULES)
+    admin = startup.import_module('handlers.admin')
+    notifications = startup.import_module('handlers.notifications')
+    anomaly = startup.import_module('utils.anomaly')
+    auth = startup.import_module('utils.auth')
+    telegram_ext = startup.import_module('telegram.ext')
+    CommandHandler = telegram_ext.CommandHandler
+    CallbackQueryHandler = telegram_ext.CallbackQueryHandler
+
     application.add_handler(CommandHandler('getlog', admin.get_log_file))
+    application.add_handler(CommandHandler('broadcast', admin.broadcast))
+    application.add_handler(CommandHandler('history', admin.history))
+    application.add_handler(CommandHandler('late', admin.late))
+    application.add_handler(CallbackQueryHandler(admin.history_page, pattern='^(hist|late):'))
+
+    # --- Send anomaly alerts to the admin as they happen ---
+    anomaly.set_job_queue(application.job_queue)
+    admin_id = auth.get_admin_id()
+    if admin_id:
+        anomaly.set_alert_handler(
+            lambda text: application.create_task(application.bot.send_message(chat_id=admin_id, text=text))
+        )
+
+    # --- Daily team-wide reminders ---
+    notifications.schedule_team_notifications(application.job_queue)
+
+    startup.report()
+
+
+# --- Main Application Logic ---
+async def main() -> None:
+    TOKEN = os.getenv("BOT_TOKEN")
+    if not TOKEN:
+        logger.critical("FATAL: BOT_TOKEN environment variable not set!")
+        return
+
+    PORT = int(os.environ.get("PORT", 8080))
+
+    # --- Health endpoint first, everything else after ---
+    with startup.timed("start web server"):
+        web_runner = await run_web_server(PORT)
+
+    with startup.timed("build application (worker thread)"):
+        application = await asyncio.to_thread(build_application, TOKEN)
+    lifecycle = startup.import_module('utils.lifecycle')
+    breaks = startup.import_module('handlers.breaks')
+    Update = startup.import_module('telegram').Update
+
+    # --- Graceful shutdown on SIGTERM (sent by Render on every redeploy) ---
+    stop_event = asyncio.Event()
+    lifecycle.install_signal_handlers(stop_event)
 
     # --- Run bot and web server concurrently ---
     logger.info("Starting bot with long polling...")
-    async with application:
-        await application.start()
-        await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
-        await run_web_server(PORT)
-        await asyncio.Event().wait()
+    # The persistent ConversationHandler needs its saved states before the first
+    # update, so the pickle must be loaded before polling; it is read off the loop.
+    with startup.timed("load persistence (worker thread)"):
+        await asyncio.to_thread(_preload_persistence, application.persistence)
+    with startup.timed("initialize application"):
+        await application.initialize()
+    try:
+        with startup.timed("start polling"):
+            await application.start()
+            # Restored before polling so no update can end a break whose reminder is still pending.
+            await lifecycle.restore_reminders(application, breaks.send_warning_callback)
+            await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        logger.info(f"Bot is polling {startup.elapsed() * 1000:.0f} ms after boot.")
+
+        application.create_task(finish_startup(application))
+        await stop_event.wait()
+        await lifecycle.shutdown(application)
+    finally:
+        # Flushes persistence to disk.
+        await application.shutdown()
+
+    await web_runner.cleanup()
+    logger.info("Shutdown complete.")
+    logging.shutdown()
 
 
 if __name__ == '__main__':
     asyncio.run(main())
-
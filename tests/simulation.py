@@ -0,0 +1,450 @@
+"""
+Simulation harness for the attendance state machine.
+
+Drives the real handlers (start, work, breaks) through randomly generated days
+under a virtual clock, the same way the ConversationHandler in main.py would.
+After every step it checks invariants (counters within limits, break durations
+adding up, break windows respected, overtime reported after midnight, ...),
+and at the end it checks each handler against a CPU time and memory
+allocation budget. tests/test_simulation.py runs it under pytest; it can also
+be run on its own for longer or specific seeds:
+
+    python -m tests.simulation --days 500 --seed 1
+
+A failing run prints the seed, day and step so it can be replayed exactly.
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from telegram.ext import ConversationHandler
+
+from handlers import breaks, start, work
+from utils import anomaly, auth, time_utils
+from utils import logger as activity_logger
+from utils.states import SELECTING_ACTION, ON_BREAK, CONFIRM_OFF_WORK
+
+# --- Constants ---
+SIM_USER_ID = 1000
+SIM_CHAT_ID = 1000
+START_DATE = (2025, 1, 6)
+END_OF_DAY_HOUR = 3  # A simulated day runs until 03:00 the next morning
+MEAN_STEP_SECONDS = 10 * 60
+JUMP_PROBABILITY = 0.3
+FLOAT_TOLERANCE = 1e-6
+
+# Times around which behaviour changes; the clock is often jumped close to them.
+# Entries are (day offset, hour, minute).
+INTERESTING_TIMES = [
+    (0, 11, 0),    # Official shift start (late / on time)
+    (0, 16, 15),   # Rest window opens
+    (0, 17, 45),   # Rest window closes
+    (0, 22, 0),    # Dinner window opens
+    (0, 22, 30),   # Dinner window closes
+    (1, 0, 0),     # Overtime cutoff
+]
+
+# --- Performance Budgets (per handler call) ---
+CPU_BUDGET_P95_SECONDS = 0.005
+# Each log_activity() call opens the CSV, which alone allocates ~130 KB of buffers.
+ALLOC_BUDGET_BYTES = 512 * 1024
+
+# Which handlers the ConversationHandler offers in each state (see main.py).
+# /start is the fallback and is therefore available everywhere.
+ACTIONS = {
+    None: [('start', start.start)],
+    SELECTING_ACTION: [
+        ('start_work', work.start_work),
+        ('off_work', work.off_work),
+        ('toilet', breaks.start_toilet_break),
+        ('eat', breaks.start_eat_break),
+        ('rest', breaks.start_rest_break),
+        ('start', start.start),
+    ],
+    ON_BREAK: [
+        ('end_break', breaks.end_break),
+        ('start', start.start),
+    ],
+    CONFIRM_OFF_WORK: [
+        ('yes', work.confirm_off_work),
+        ('no', work.cancel_off_work),
+        ('start', start.start),
+    ],
+}
+# /start wipes the day, so it is picked far less often than the buttons.
+ACTION_WEIGHTS = {'start': 0.05}
+
+BREAK_LIMITS = {
+    'toilet': breaks.MAX_TOILET_BREAKS,
+    'eat': breaks.MAX_EAT_BREAKS,
+    'rest': breaks.MAX_REST_BREAKS,
+}
+BREAK_WINDOWS = {
+    'eat': ((22, 0), (22, 30)),
+    'rest': ((16, 15), (17, 45)),
+}
+
+
+# --- Fakes for the parts of Update / Context the handlers use ---
+class _FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.username = f"sim_{user_id}"
+        self.first_name = "Sim"
+        self.full_name = "Sim User"
+
+
+class _FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class _FakeChat:
+    def __init__(self, chat_id: int):
+        self.id = chat_id
+
+
+class _FakeUpdate:
+    def __init__(self, user: _FakeUser, chat: _FakeChat):
+        self.effective_user = user
+        self.effective_chat = chat
+        self.message = _FakeMessage()
+
+
+class _FakeJob:
+    def __init__(self, job_queue, name: str):
+        self._job_queue = job_queue
+        self.name = name
+
+    def schedule_removal(self):
+        self._job_queue.jobs.remove(self)
+
+
+class _FakeJobQueue:
+    def __init__(self):
+        self.jobs = []
+
+    def run_once(self, callback, when, data=None, name=None):
+        job = _FakeJob(self, name)
+        self.jobs.append(job)
+        return job
+
+    def get_jobs_by_name(self, name: str):
+        return [job for job in self.jobs if job.name == name]
+
+
+class _FakeContext:
+    def __init__(self):
+        self.user_data = {}
+        self.job_queue = _FakeJobQueue()
+        self.args = []
+
+
+# --- Virtual Clock ---
+class VirtualClock:
+    """A clock that only moves when told to. Install it with time_utils.set_clock(clock)."""
+
+    def __init__(self, start: datetime):
+        self.now = start
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now = self.now + timedelta(seconds=seconds)
+
+
+def _local(day: datetime, day_offset: int, hour: int, minute: int) -> datetime:
+    """Returns the local time hour:minute, day_offset days after day's date."""
+    date = (day + timedelta(days=day_offset)).date()
+    return time_utils.TIMEZONE.localize(datetime(date.year, date.month, date.day, hour, minute))
+
+
+def _in_window(now: datetime, window) -> bool:
+    """True if now lies within ((start_hour, start_minute), (end_hour, end_minute)) on now's date."""
+    (start_hour, start_minute), (end_hour, end_minute) = window
+    start_time = now.replace(hour=start_hour, minute=start_minute, second=0, microsecond=0)
+    end_time = now.replace(hour=end_hour, minute=end_minute, second=0, microsecond=0)
+    return start_time <= now <= end_time
+
+
+# --- Invariants ---
+def _check_step(model: dict, context: _FakeContext, update: _FakeUpdate, action: str,
+                previous_state, state, now: datetime) -> list:
+    """Checks the invariants that must hold after one handler call. Returns a list of violations."""
+    violations = []
+    user_data = context.user_data
+
+    if state not in (SELECTING_ACTION, ON_BREAK, CONFIRM_OFF_WORK, ConversationHandler.END):
+        violations.append(f"{action} returned unknown state {state!r}")
+    if not update.message.replies:
+        violations.append(f"{action} did not reply")
+
+    if state == ConversationHandler.END:
+        if user_data:
+            violations.append(f"user_data not cleared after check-out: {user_data}")
+        return violations
+
+    for break_type, limit in BREAK_LIMITS.items():
+        count = user_data.get(f'{break_type}_breaks_today', 0)
+        if count > limit:
+            violations.append(f"{break_type}_breaks_today is {count}, limit is {limit}")
+
+    if (state == ON_BREAK) != bool(user_data.get('on_break')):
+        violations.append(f"state {state} does not match on_break={user_data.get('on_break')}")
+
+    for break_type, expected in model['durations'].items():
+        actual = user_data.get(f'total_{break_type}_duration', 0.0)
+        if abs(actual - expected) > FLOAT_TOLERANCE:
+            violations.append(f"total_{break_type}_duration is {actual}, expected {expected}")
+        if actual < 0:
+            violations.append(f"total_{break_type}_duration is negative: {actual}")
+
+    work_start_time = user_data.get('work_start_time')
+    if work_start_time:
+        total_breaks = sum(model['durations'].values())
+        if total_breaks > (now - work_start_time).total_seconds() + FLOAT_TOLERANCE:
+            violations.append("break time exceeds time since check-in")
+
+    if previous_state == SELECTING_ACTION and state == ON_BREAK:
+        break_type = user_data.get('current_break_type')
+        window = BREAK_WINDOWS.get(break_type)
+        if window and not _in_window(now, window):
+            violations.append(f"{break_type} break started outside its window at {now.strftime('%H:%M:%S')}")
+        if break_type == 'toilet' and len(context.job_queue.jobs) != 1:
+            violations.append(f"expected one toilet reminder, found {len(context.job_queue.jobs)}")
+
+    if action == 'end_break' and context.job_queue.jobs:
+        violations.append(f"{len(context.job_queue.jobs)} reminder(s) left after end_break")
+
+    return violations
+
+
+def _check_checkout(model: dict, update: _FakeUpdate, now: datetime) -> list:
+    """Checks that overtime is reported exactly when checking out after midnight."""
+    work_start_time = model['work_start_time']
+    shift_end = work_start_time.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    reported = any('Overtime Worked' in reply for reply in update.message.replies)
+    if reported != (now > shift_end):
+        return [f"overtime reported={reported} for check-out at {now.isoformat()} (shift end {shift_end.isoformat()})"]
+    return []
+
+
+def _check_log(log_file: str, expected_end_breaks: int) -> list:
+    """Checks the CSV written during the run: shift dates roll over at 06:00, one end_break per break."""
+    violations = []
+    end_breaks = 0
+    with open(log_file, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if row[0] == 'timestamp_utc':
+                continue
+            timestamp = datetime.fromisoformat(row[0])
+            expected_shift = timestamp - timedelta(days=1) if timestamp.hour < 6 else timestamp
+            if row[5] != expected_shift.strftime('%Y-%m-%d'):
+                violations.append(f"row at {row[0]} has shift_date {row[5]}")
+            if row[3] == 'end_break':
+                end_breaks += 1
+    if end_breaks != expected_end_breaks:
+        violations.append(f"log has {end_breaks} end_break rows, expected {expected_end_breaks}")
+    return violations
+
+
+# --- Simulation ---
+def _next_time(rng: random.Random, clock: VirtualClock, day: datetime) -> float:
+    """Picks how far to move the clock: usually a random step, sometimes a jump near a window edge."""
+    if rng.random() < JUMP_PROBABILITY:
+        day_offset, hour, minute = rng.choice(INTERESTING_TIMES)
+        target = _local(day, day_offset, hour, minute) + timedelta(seconds=rng.uniform(-300, 300))
+        if target > clock.now:
+            return (target - clock.now).total_seconds()
+    return rng.expovariate(1 / MEAN_STEP_SECONDS)
+
+
+def _pick_action(rng: random.Random, state):
+    """Picks the next (name, handler) among those the conversation offers in state."""
+    choices = ACTIONS[state]
+    weights = [ACTION_WEIGHTS.get(name, 1.0) for name, _ in choices]
+    return rng.choices(choices, weights=weights)[0]
+
+
+def _reset_model(model: dict) -> None:
+    """Resets the expected per-day totals, as /start and check-out do for user_data."""
+    model['durations'] = {break_type: 0.0 for break_type in BREAK_LIMITS}
+    model['work_start_time'] = None
+
+
+async def simulate(days: int, seed: int) -> dict:
+    """Runs the simulation (inside sandbox()) and returns {'steps', 'violations', 'timings'}."""
+    rng = random.Random(seed)
+    day = _local(datetime(*START_DATE), 0, 0, 0)
+    clock = VirtualClock(day)
+    time_utils.set_clock(clock)
+    tracemalloc.start()
+    try:
+        return await _run_days(rng, clock, days, seed)
+    finally:
+        tracemalloc.stop()
+        time_utils.set_clock(None)
+
+
+async def _run_days(rng: random.Random, clock: VirtualClock, days: int, seed: int) -> dict:
+    """The simulation loop behind simulate()."""
+    user = _FakeUser(SIM_USER_ID)
+    chat = _FakeChat(SIM_CHAT_ID)
+    context = _FakeContext()
+    model = {'end_breaks': 0}
+    _reset_model(model)
+
+    state = None
+    steps = 0
+    violations = []
+    timings = {}
+
+    for day_number in range(days):
+        day = _local(datetime(*START_DATE), day_number, 0, 0)
+        morning = _local(day, 0, 9, 0) + timedelta(seconds=rng.uniform(0, 3.5 * 3600))
+        clock.now = max(clock.now, morning)
+        end_of_day = _local(day, 1, END_OF_DAY_HOUR, 0)
+
+        while clock.now < end_of_day:
+            name, handler = _pick_action(rng, state)
+            previous_state = state
+            break_start_time = context.user_data.get('break_start_time')
+            break_type = context.user_data.get('current_break_type')
+            update = _FakeUpdate(user, chat)
+
+            tracemalloc.reset_peak()
+            allocated_before = tracemalloc.get_traced_memory()[0]
+            cpu_before = time.process_time()
+            result = await handler(update, context)
+            cpu_used = time.process_time() - cpu_before
+            alloc_peak = tracemalloc.get_traced_memory()[1] - allocated_before
+            timings.setdefault(name, []).append((cpu_used, alloc_peak))
+
+            state = None if result == ConversationHandler.END else result
+            steps += 1
+
+            # Mirror what the handler should have done in the model.
+            if name == 'start':
+                _reset_model(model)
+            elif name == 'start_work' and previous_state == SELECTING_ACTION and model['work_start_time'] is None:
+                model['work_start_time'] = clock.now
+            elif name == 'end_break' and break_start_time and break_type:
+                model['durations'][break_type] += (clock.now - break_start_time).total_seconds()
+                model['end_breaks'] += 1
+
+            step_violations = _check_step(model, context, update, name, previous_state, result, clock.now)
+            if name == 'yes' and result == ConversationHandler.END:
+                step_violations += _check_checkout(model, update, clock.now)
+                _reset_model(model)
+            for violation in step_violations:
+                violations.append(f"seed={seed} day={day_number} step={steps} {clock.now.isoformat()}: {violation}")
+
+            if state is None:
+                break  # Checked out; the next day begins with /start.
+            clock.advance(_next_time(rng, clock, day))
+
+    violations += _check_log(activity_logger.LOG_FILE, model['end_breaks'])
+    return {'steps': steps, 'violations': violations, 'timings': timings}
+
+
+def check_budgets(timings: dict) -> list:
+    """Returns a violation for every handler whose p95 CPU time or peak allocation is over budget."""
+    violations = []
+    for name, samples in sorted(timings.items()):
+        cpu_times = sorted(cpu for cpu, _ in samples)
+        p95 = cpu_times[min(len(cpu_times) - 1, int(len(cpu_times) * 0.95))]
+        peak = max(alloc for _, alloc in samples)
+        if p95 > CPU_BUDGET_P95_SECONDS:
+            violations.append(f"{name}: p95 CPU {p95 * 1000:.2f} ms exceeds {CPU_BUDGET_P95_SECONDS * 1000:.2f} ms")
+        if peak > ALLOC_BUDGET_BYTES:
+            violations.append(f"{name}: peak allocation {peak // 1024} KB exceeds {ALLOC_BUDGET_BYTES // 1024} KB")
+    return violations
+
+
+def _print_report(result: dict, budget_violations: list) -> None:
+    """Prints per-handler timings and any violations."""
+    print(f"Simulated {result['steps']} steps.")
+    print(f"{'handler':<12}{'calls':>8}{'p95 cpu ms':>12}{'peak KB':>10}")
+    for name, samples in sorted(result['timings'].items()):
+        cpu_times = sorted(cpu for cpu, _ in samples)
+        p95 = cpu_times[min(len(cpu_times) - 1, int(len(cpu_times) * 0.95))]
+        peak = max(alloc for _, alloc in samples)
+        print(f"{name:<12}{len(samples):>8}{p95 * 1000:>12.3f}{peak / 1024:>10.1f}")
+
+    violations = result['violations'] + budget_violations
+    if violations:
+        print(f"\n{len(violations)} violation(s):")
+        for violation in violations[:50]:
+            print(f"  {violation}")
+    else:
+        print("\nAll invariants and budgets held.")
+
+
+@contextmanager
+def sandbox(workdir: str):
+    """
+    Isolates a simulation run: logs go to workdir, only the simulated user is
+    authorized, anomaly alerts are off and logging is muted. Everything that
+    was changed is put back on exit.
+    """
+    saved_log_file = activity_logger.LOG_FILE
+    saved_flag_file = anomaly.FLAG_FILE
+    saved_alert_handler = anomaly._alert_handler
+    saved_job_queue = anomaly._job_queue
+    saved_allowed_ids = os.environ.get('ALLOWED_USER_IDS')
+
+    activity_logger.LOG_FILE = os.path.join(workdir, 'work_tracker_log.csv')
+    anomaly.FLAG_FILE = os.path.join(workdir, 'flagged_events.csv')
+    anomaly.set_alert_handler(None)
+    anomaly.set_job_queue(None)
+    anomaly.reset()
+    os.environ['ALLOWED_USER_IDS'] = str(SIM_USER_ID)
+    auth.get_allowed_ids.cache_clear()
+    # Handler logging (and anomaly warnings) would drown the report.
+    logging.disable(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        logging.disable(logging.NOTSET)
+        activity_logger.LOG_FILE = saved_log_file
+        anomaly.FLAG_FILE = saved_flag_file
+        anomaly.set_alert_handler(saved_alert_handler)
+        anomaly.set_job_queue(saved_job_queue)
+        anomaly.reset()
+        if saved_allowed_ids is None:
+            os.environ.pop('ALLOWED_USER_IDS', None)
+        else:
+            os.environ['ALLOWED_USER_IDS'] = saved_allowed_ids
+        auth.get_allowed_ids.cache_clear()
+
+
+def main(argv=None) -> int:
+    """Command-line entry point. Returns the process exit status."""
+    parser = argparse.ArgumentParser(description="Simulate attendance days under a virtual clock.")
+    parser.add_argument('--days', type=int, default=200, help="number of simulated days (default: 200)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: 0)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as workdir, sandbox(workdir):
+        result = asyncio.run(simulate(args.days, args.seed))
+
+    budget_violations = check_budgets(result['timings'])
+    _print_report(result, budget_violations)
+    return 1 if result['violations'] or budget_violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
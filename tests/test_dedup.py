@@ -0,0 +1,61 @@
+"""
+Tests for utils.dedup.is_duplicate: redelivered updates and double-taps.
+"""
+import pytest
+
+from utils import dedup
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    dedup.reset()
+    yield
+    dedup.reset()
+
+
+def test_repeated_update_id_is_duplicate():
+    assert not dedup.is_duplicate(1, 10, '🚽 Toilet', sent_at=100.0)
+    assert dedup.is_duplicate(1, 10, '🚽 Toilet', sent_at=100.0)
+
+
+def test_same_action_within_window_is_duplicate():
+    assert not dedup.is_duplicate(1, 10, '🚽 Toilet', sent_at=100.0)
+    assert dedup.is_duplicate(2, 10, '🚽 Toilet', sent_at=101.0)
+
+
+def test_same_action_after_window_is_not_duplicate():
+    assert not dedup.is_duplicate(1, 10, '🚽 Toilet', sent_at=100.0)
+    assert not dedup.is_duplicate(2, 10, '🚽 Toilet', sent_at=100.0 + dedup.ACTION_WINDOW_SECONDS)
+
+
+def test_repeat_after_another_action_is_not_collapsed():
+    assert not dedup.is_duplicate(1, 10, '🚽 Toilet', sent_at=100.0)
+    assert not dedup.is_duplicate(2, 10, '🏃 Back to Seat', sent_at=100.5)
+    assert not dedup.is_duplicate(3, 10, '🚽 Toilet', sent_at=101.0)
+
+
+def test_other_users_do_not_collapse():
+    assert not dedup.is_duplicate(1, 10, '🚽 Toilet', sent_at=100.0)
+    assert not dedup.is_duplicate(2, 11, '🚽 Toilet', sent_at=100.5)
+
+
+def test_least_recently_active_user_is_evicted(monkeypatch):
+    monkeypatch.setattr(dedup, 'ACTION_CACHE_SIZE', 2)
+    assert not dedup.is_duplicate(1, 10, '🚽 Toilet', sent_at=100.0)
+    assert not dedup.is_duplicate(2, 11, '🚽 Toilet', sent_at=100.0)
+    assert not dedup.is_duplicate(3, 10, '🍔 Eat', sent_at=100.1)  # User 10 becomes most recent
+    assert not dedup.is_duplicate(4, 12, '🚽 Toilet', sent_at=100.2)  # Evicts user 11
+
+    assert list(dedup._last_actions) == [10, 12]
+    assert dedup.is_duplicate(5, 10, '🍔 Eat', sent_at=100.3)
+    assert not dedup.is_duplicate(6, 11, '🚽 Toilet', sent_at=100.4)  # Forgotten, so not a repeat
+
+
+def test_oldest_update_id_is_evicted(monkeypatch):
+    monkeypatch.setattr(dedup, 'UPDATE_CACHE_SIZE', 2)
+    for update_id in (1, 2, 3):
+        assert not dedup.is_duplicate(update_id, None, None)
+
+    assert 1 not in dedup._seen_updates
+    assert not dedup.is_duplicate(1, None, None)
+    assert dedup.is_duplicate(3, None, None)
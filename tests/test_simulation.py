@@ -0,0 +1,27 @@
+"""
+Runs the attendance state machine simulation (tests/simulation.py) under pytest,
+so invariant violations and performance budget overruns fail the test suite.
+"""
+import asyncio
+
+import pytest
+
+from tests.simulation import check_budgets, sandbox, simulate
+
+SIMULATED_DAYS = 150
+
+
+@pytest.fixture(scope='module', params=range(3), ids=lambda seed: f'seed{seed}')
+def simulation(request, tmp_path_factory):
+    """Simulates SIMULATED_DAYS once per seed; every test below checks the same run."""
+    with sandbox(str(tmp_path_factory.mktemp(f'seed{request.param}'))):
+        return asyncio.run(simulate(SIMULATED_DAYS, request.param))
+
+
+def test_simulated_days_hold_invariants(simulation):
+    assert simulation['steps'] > 0
+    assert simulation['violations'] == []
+
+
+def test_handlers_stay_within_budgets(simulation):
+    assert check_budgets(simulation['timings']) == []
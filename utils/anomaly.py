@@ -0,0 +1,215 @@
+"""
+Streaming anomaly detection over the activity log.
+
+Every event written by utils.logger.log_activity is passed to observe(), which
+updates a small amount of per-user state and checks a few rules in constant
+time. Nothing here ever re-reads the CSV history.
+"""
+import csv
+import logging
+import os
+import re
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+FLAG_FILE = 'flagged_events.csv'
+FLAG_HEADER = ['timestamp_utc', 'user_id', 'username', 'rule', 'details', 'shift_date']
+
+# Repeated check-ins: this many start_work events inside the window is suspicious.
+REPEATED_CHECKIN_COUNT = 3
+REPEATED_CHECKIN_WINDOW_SECONDS = 15 * 60
+
+# Overtime outliers
+BREAK_OVERTIME_ALERT_SECONDS = 15 * 60
+WORK_OVERTIME_ALERT_SECONDS = 2 * 60 * 60
+
+# A break still open this long after it started is reported as abandoned,
+# even if the user never logs another event.
+UNENDED_BREAK_DEADLINE_SECONDS = {
+    'start_toilet': 30 * 60,
+    'start_eat': 60 * 60,
+    'start_rest': 2 * 60 * 60,
+}
+
+# Upper bound on how many users we keep state for (least recently seen are evicted).
+MAX_TRACKED_USERS = 5000
+
+# --- Rule Names ---
+RULE_REPEATED_CHECKIN = 'repeated_checkin'
+RULE_UNENDED_BREAK = 'unended_break'
+RULE_OVERTIME_OUTLIER = 'overtime_outlier'
+
+_DURATION_PATTERN = re.compile(r'(\d+):(\d{2}):(\d{2})')
+
+# --- State ---
+_user_state = OrderedDict()
+_alert_handler = None
+_job_queue = None
+
+
+def set_alert_handler(handler) -> None:
+    """Registers handler(text) to be called for every alert, e.g. to notify the admin."""
+    global _alert_handler
+    _alert_handler = handler
+
+
+def set_job_queue(job_queue) -> None:
+    """Registers the JobQueue used for abandoned-break deadlines. Without one, only the next-event check runs."""
+    global _job_queue
+    _job_queue = job_queue
+
+
+def reset() -> None:
+    """Forgets all per-user state."""
+    _user_state.clear()
+
+
+def _get_state(user_id: int) -> dict:
+    """Returns the state for user_id, creating it and evicting the oldest user if needed."""
+    state = _user_state.get(user_id)
+    if state is None:
+        state = {
+            'checkins': deque(maxlen=REPEATED_CHECKIN_COUNT),
+            'open_break': None,
+            'deadline_job': None,
+        }
+        _user_state[user_id] = state
+        if len(_user_state) > MAX_TRACKED_USERS:
+            _user_state.popitem(last=False)
+    else:
+        _user_state.move_to_end(user_id)
+    return state
+
+
+def _parse_duration(details: str) -> int:
+    """Extracts the first HH:MM:SS duration from a log details string, in seconds."""
+    match = _DURATION_PATTERN.search(details or '')
+    if not match:
+        return 0
+    hours, minutes, seconds = (int(part) for part in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _check_rules(state: dict, event: str, details: str, now: datetime) -> list:
+    """Applies every rule to one event. Returns a list of (rule, description) tuples."""
+    findings = []
+
+    if event == 'start_work':
+        checkins = state['checkins']
+        checkins.append(now)
+        if len(checkins) == REPEATED_CHECKIN_COUNT:
+            elapsed = (now - checkins[0]).total_seconds()
+            if elapsed <= REPEATED_CHECKIN_WINDOW_SECONDS:
+                findings.append((
+                    RULE_REPEATED_CHECKIN,
+                    f"{REPEATED_CHECKIN_COUNT} check-ins within {int(elapsed // 60)} min"
+                ))
+                checkins.clear()  # Alert once per burst
+
+    if event.startswith('start_') or event == 'off_work':
+        open_break = state['open_break']
+        if open_break is not None:
+            break_event, started_at = open_break
+            findings.append((
+                RULE_UNENDED_BREAK,
+                f"{break_event} at {started_at.strftime('%H:%M:%S')} was never ended (next event: {event})"
+            ))
+            state['open_break'] = None
+
+    if event in UNENDED_BREAK_DEADLINE_SECONDS:
+        state['open_break'] = (event, now)
+    elif event == 'end_break':
+        state['open_break'] = None
+
+    if event.endswith('_overtime'):
+        limit = WORK_OVERTIME_ALERT_SECONDS if event == 'work_overtime' else BREAK_OVERTIME_ALERT_SECONDS
+        if _parse_duration(details) > limit:
+            findings.append((RULE_OVERTIME_OUTLIER, f"{event}: {details}"))
+
+    return findings
+
+
+def _write_flag(now: datetime, user_id: int, username: str, rule: str, details: str, shift_date_str: str):
+    """Appends a flagged record to FLAG_FILE."""
+    write_header = not os.path.exists(FLAG_FILE)
+    with open(FLAG_FILE, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(FLAG_HEADER)
+        writer.writerow([now.isoformat(), user_id, username, rule, details, shift_date_str])
+
+
+def _raise_findings(findings: list, now: datetime, user_id: int, username: str, shift_date_str: str) -> None:
+    """Logs, flags and alerts every finding."""
+    for rule, description in findings:
+        logger.warning(f"Anomaly {rule} for user {user_id} ({username}): {description}")
+        try:
+            _write_flag(now, user_id, username, rule, description, shift_date_str)
+        except OSError as e:
+            logger.error(f"Could not write flagged record: {e}")
+
+        if _alert_handler:
+            try:
+                _alert_handler(f"🚩 {rule}: {username} ({user_id})\n{description}")
+            except Exception as e:
+                logger.error(f"Alert handler failed: {e}")
+
+
+def _update_deadline(state: dict, user_id: int, username: str, shift_date_str: str) -> None:
+    """Keeps one deadline job per user, armed exactly while a break is open."""
+    if state['deadline_job'] is not None:
+        state['deadline_job'].schedule_removal()
+        state['deadline_job'] = None
+
+    if state['open_break'] is None or _job_queue is None:
+        return
+    break_event, started_at = state['open_break']
+    state['deadline_job'] = _job_queue.run_once(
+        _break_deadline_callback,
+        UNENDED_BREAK_DEADLINE_SECONDS[break_event],
+        data={
+            'user_id': user_id,
+            'username': username,
+            'break_event': break_event,
+            'started_at': started_at,
+            'shift_date': shift_date_str,
+        },
+        name=f'anomaly_break_deadline_{user_id}'
+    )
+
+
+async def _break_deadline_callback(context) -> None:
+    """JobQueue callback: the user's break passed its deadline without being ended."""
+    data = context.job.data
+    state = _user_state.get(data['user_id'])
+    if state is None or state['open_break'] != (data['break_event'], data['started_at']):
+        return  # The break was ended or replaced in the meantime.
+
+    state['open_break'] = None
+    state['deadline_job'] = None
+    deadline_seconds = UNENDED_BREAK_DEADLINE_SECONDS[data['break_event']]
+    findings = [(
+        RULE_UNENDED_BREAK,
+        f"{data['break_event']} at {data['started_at'].strftime('%H:%M:%S')} still not ended after {deadline_seconds // 60} min"
+    )]
+    deadline = data['started_at'] + timedelta(seconds=deadline_seconds)
+    _raise_findings(findings, deadline, data['user_id'], data['username'], data['shift_date'])
+
+
+def observe(user_id: int, username: str, event: str, details: str, now: datetime, shift_date_str: str) -> list:
+    """
+    Feeds one activity event into the rule engine.
+    Flags and alerts are raised for every rule that fires; the findings are returned.
+    """
+    state = _get_state(user_id)
+    open_break_before = state['open_break']
+    findings = _check_rules(state, event, details, now)
+    if state['open_break'] != open_break_before:
+        _update_deadline(state, user_id, username, shift_date_str)
+
+    _raise_findings(findings, now, user_id, username, shift_date_str)
+    return findings
@@ -2,7 +2,7 @@
 Authorization decorators to restrict access to certain handlers.
 """
 import os
-from functools import wraps
+from functools import lru_cache, wraps
 from telegram import Update
 from telegram.ext import ContextTypes
 import logging
@@ -11,25 +11,29 @@ import logging
 logger = logging.getLogger(__name__)
 
 # --- Regular User Authorization ---
-ALLOWED_USER_IDS_STR = os.getenv('ALLOWED_USER_IDS')
-if not ALLOWED_USER_IDS_STR:
-    logger.warning("ALLOWED_USER_IDS environment variable is not set. No users will be authorized.")
-    ALLOWED_IDS = set()
-else:
+# The environment is parsed on first use rather than at import time to keep startup fast.
+@lru_cache(maxsize=None)
+def get_allowed_ids() -> frozenset:
+    """Returns the set of authorized user IDs from ALLOWED_USER_IDS."""
+    allowed_user_ids_str = os.getenv('ALLOWED_USER_IDS')
+    if not allowed_user_ids_str:
+        logger.warning("ALLOWED_USER_IDS environment variable is not set. No users will be authorized.")
+        return frozenset()
     try:
         # Read comma-separated IDs and convert them to a set of integers
-        ALLOWED_IDS = {int(user_id.strip()) for user_id in ALLOWED_USER_IDS_STR.split(',')}
-        logger.info(f"Authorization enabled for user IDs: {ALLOWED_IDS}")
+        allowed_ids = frozenset(int(user_id.strip()) for user_id in allowed_user_ids_str.split(','))
+        logger.info(f"Authorization enabled for user IDs: {set(allowed_ids)}")
+        return allowed_ids
     except ValueError:
         logger.error("ALLOWED_USER_IDS environment variable contains non-integer values. Authorization will fail.")
-        ALLOWED_IDS = set()
+        return frozenset()
 
 def restricted(func):
     """Decorator to restrict usage of a handler to authorized users."""
     @wraps(func)
     async def wrapped(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
         user = update.effective_user
-        if not user or user.id not in ALLOWED_IDS:
+        if not user or user.id not in get_allowed_ids():
             if user:
                 logger.warning(f"Unauthorized access attempt by user ID: {user.id} ({user.username}).")
                 await update.message.reply_text("Sorry, you are not authorized to use this bot.")
@@ -40,24 +44,28 @@ def restricted(func):
     return wrapped
 
 # --- Admin User Authorization ---
-ADMIN_ID_STR = os.getenv('ADMIN_ID')
-ADMIN_ID = None
-if not ADMIN_ID_STR:
-    logger.warning("ADMIN_ID environment variable is not set. Admin commands will not work.")
-else:
+@lru_cache(maxsize=None)
+def get_admin_id():
+    """Returns the admin user ID from ADMIN_ID, or None if it is missing or invalid."""
+    admin_id_str = os.getenv('ADMIN_ID')
+    if not admin_id_str:
+        logger.warning("ADMIN_ID environment variable is not set. Admin commands will not work.")
+        return None
     try:
         # Read the single admin ID and convert it to an integer
-        ADMIN_ID = int(ADMIN_ID_STR.strip())
-        logger.info(f"Admin commands enabled for admin ID: {ADMIN_ID}")
+        admin_id = int(admin_id_str.strip())
+        logger.info(f"Admin commands enabled for admin ID: {admin_id}")
+        return admin_id
     except ValueError:
         logger.error("ADMIN_ID environment variable is not a valid integer. Admin commands will fail.")
+        return None
 
 def admin_only(func):
     """Decorator to restrict usage of a handler to the admin only."""
     @wraps(func)
     async def wrapped(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
         user = update.effective_user
-        if not user or user.id != ADMIN_ID:
+        if not user or user.id != get_admin_id():
             if user:
                 logger.warning(f"Non-admin user {user.id} ({user.username}) attempted to use an admin command.")
                 # We don't send a message back to avoid revealing admin commands exist.
@@ -67,3 +75,11 @@ def admin_only(func):
         return await func(update, context, *args, **kwargs) # Allow the function
     return wrapped
 
+
+def __getattr__(name):
+    """Keeps the old ALLOWED_IDS / ADMIN_ID module attributes working, resolved lazily."""
+    if name == 'ALLOWED_IDS':
+        return get_allowed_ids()
+    if name == 'ADMIN_ID':
+        return get_admin_id()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,141 @@
+"""
+Chunked, rate-aware message fan-out to many users at once.
+"""
+import asyncio
+import logging
+import time
+
+from telegram import Bot
+from telegram.error import Forbidden, RetryAfter, TelegramError
+from telegram.ext import Application
+
+from utils.auth import get_allowed_ids
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Telegram allows roughly 30 messages per second across all chats, so we send
+# one chunk of CHUNK_SIZE messages concurrently, then wait CHUNK_INTERVAL_SECONDS.
+CHUNK_SIZE = 25
+CHUNK_INTERVAL_SECONDS = 1.0
+
+# --- State ---
+# Chunk slots are shared by every fan-out, so an admin broadcast and a scheduled
+# notification running at the same time stay under the limit together.
+_next_chunk_at = 0.0
+
+# --- Audiences ---
+AUDIENCE_ALL = 'all'
+AUDIENCE_WORKING = 'working'
+AUDIENCE_ON_BREAK = 'on_break'
+AUDIENCE_NOT_STARTED = 'not_started'
+AUDIENCES = (AUDIENCE_ALL, AUDIENCE_WORKING, AUDIENCE_ON_BREAK, AUDIENCE_NOT_STARTED)
+
+
+def select_recipients(application: Application, audience: str = AUDIENCE_ALL) -> list:
+    """Returns the authorized user IDs matching the given audience, based on their user_data."""
+    recipients = []
+    for user_id in sorted(get_allowed_ids()):
+        user_data = application.user_data.get(user_id) or {}
+        work_started = bool(user_data.get('work_started'))
+        on_break = bool(user_data.get('on_break'))
+
+        if audience == AUDIENCE_ALL:
+            recipients.append(user_id)
+        elif audience == AUDIENCE_WORKING and work_started:
+            recipients.append(user_id)
+        elif audience == AUDIENCE_ON_BREAK and on_break:
+            recipients.append(user_id)
+        elif audience == AUDIENCE_NOT_STARTED and not work_started:
+            recipients.append(user_id)
+    return recipients
+
+
+async def _send_one(bot: Bot, chat_id: int, text: str):
+    """Sends one message. Returns None on success or a short failure reason."""
+    for attempt in range(2):
+        try:
+            await bot.send_message(chat_id=chat_id, text=text)
+            return None
+        except RetryAfter as e:
+            if attempt:
+                return f"rate limited ({e.retry_after}s)"
+            logger.warning(f"Flood control hit while broadcasting; waiting {e.retry_after}s.")
+            await asyncio.sleep(e.retry_after)
+        except Forbidden:
+            return "blocked the bot"
+        except TelegramError as e:
+            return str(e)
+    return "unknown error"
+
+
+async def _wait_for_chunk_slot() -> None:
+    """Reserves the next free chunk slot and sleeps until it starts."""
+    global _next_chunk_at
+    now = time.monotonic()
+    start = max(now, _next_chunk_at)
+    _next_chunk_at = start + CHUNK_INTERVAL_SECONDS
+    if start > now:
+        await asyncio.sleep(start - now)
+
+
+async def fan_out(bot: Bot, user_ids: list, text: str, progress_callback=None, result: dict = None) -> dict:
+    """
+    Sends text to every user in user_ids, CHUNK_SIZE messages per CHUNK_INTERVAL_SECONDS
+    across all fan-outs in the process.
+    progress_callback(done, total) is awaited after each chunk, if given.
+    Returns {'sent': int, 'failed': {user_id: reason}, 'done': int}. If a result
+    dict is passed in it is filled as the fan-out goes, so the caller still has
+    the partial counts if the task is cancelled.
+    """
+    if result is None:
+        result = {}
+    result.update({'sent': 0, 'failed': {}, 'done': 0})
+    total = len(user_ids)
+
+    for offset in range(0, total, CHUNK_SIZE):
+        chunk = user_ids[offset:offset + CHUNK_SIZE]
+        await _wait_for_chunk_slot()
+        results = await asyncio.gather(*(_send_one(bot, user_id, text) for user_id in chunk))
+        for user_id, reason in zip(chunk, results):
+            if reason is None:
+                result['sent'] += 1
+            else:
+                result['failed'][user_id] = reason
+
+        result['done'] = offset + len(chunk)
+        if progress_callback:
+            try:
+                await progress_callback(result['done'], total)
+            except TelegramError as e:
+                logger.warning(f"Could not report broadcast progress: {e}")
+
+    logger.info(f"Broadcast finished: {result['sent']}/{total} sent, {len(result['failed'])} failed.")
+    return result
+
+
+# --- Background Broadcasts ---
+# Plain asyncio tasks rather than application.create_task() or a JobQueue job:
+# Application.stop() waits for both, which would hold up shutdown for the length
+# of a broadcast.
+_running = set()
+
+
+def start_background(coroutine) -> asyncio.Task:
+    """Runs a broadcast coroutine in the background and tracks it until it finishes."""
+    task = asyncio.create_task(coroutine)
+    _running.add(task)
+    task.add_done_callback(_running.discard)
+    return task
+
+
+async def cancel_running() -> int:
+    """Cancels all running background broadcasts and waits for them to wind down."""
+    tasks = list(_running)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if tasks:
+        logger.info(f"Cancelled {len(tasks)} running broadcast(s).")
+    return len(tasks)
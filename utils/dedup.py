@@ -0,0 +1,92 @@
+"""
+Drops duplicate updates before they reach any handler.
+
+Two kinds of duplicates are caught:
+  - the same update_id delivered again (Telegram redelivery after network errors)
+  - the same user repeating their immediately previous action within a short
+    window (double-taps), measured by when the user sent it, not when we got it
+Both caches are bounded in size, so memory use stays flat.
+"""
+import logging
+import time
+from collections import OrderedDict
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+UPDATE_CACHE_SIZE = 1000
+UPDATE_TTL_SECONDS = 10 * 60
+ACTION_WINDOW_SECONDS = 2.0
+ACTION_CACHE_SIZE = 5000
+
+# --- State ---
+_seen_updates = OrderedDict()  # update_id -> time first seen (monotonic)
+_last_actions = OrderedDict()  # user_id -> (action, time sent), least recently active first
+
+
+def _expire_updates(now: float) -> None:
+    """Evicts update_ids older than UPDATE_TTL_SECONDS."""
+    while _seen_updates and now - next(iter(_seen_updates.values())) > UPDATE_TTL_SECONDS:
+        _seen_updates.popitem(last=False)
+
+
+def is_duplicate(update_id: int, user_id, action, sent_at: float = None) -> bool:
+    """
+    Records the update and returns True if it was already seen, or if it repeats
+    the user's previous action less than ACTION_WINDOW_SECONDS after it.
+    sent_at is when the user sent the action (epoch seconds); defaults to now.
+    """
+    received_at = time.monotonic()
+    _expire_updates(received_at)
+    if update_id in _seen_updates:
+        return True
+    _seen_updates[update_id] = received_at
+    if len(_seen_updates) > UPDATE_CACHE_SIZE:
+        _seen_updates.popitem(last=False)
+
+    if user_id is None or not action:
+        return False
+    if sent_at is None:
+        sent_at = time.time()
+
+    previous = _last_actions.get(user_id)
+    _last_actions[user_id] = (action, sent_at)
+    _last_actions.move_to_end(user_id)
+    if len(_last_actions) > ACTION_CACHE_SIZE:
+        _last_actions.popitem(last=False)
+
+    if previous is None:
+        return False
+    previous_action, previous_sent_at = previous
+    return previous_action == action and 0 <= sent_at - previous_sent_at < ACTION_WINDOW_SECONDS
+
+
+def reset() -> None:
+    """Clears both caches."""
+    _seen_updates.clear()
+    _last_actions.clear()
+
+
+async def drop_duplicate_updates(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handler for group -1: stops processing of duplicate updates before any other handler runs."""
+    user = update.effective_user
+    action = None
+    sent_at = None
+    if update.message and update.message.text:
+        action = update.message.text
+        # Send time, so a backlog replayed after an outage is judged by when the taps happened.
+        sent_at = update.message.date.timestamp()
+    elif update.callback_query:
+        # effective_message.date would be when the bot sent the buttons, not when one was tapped.
+        action = update.callback_query.data
+
+    if is_duplicate(update.update_id, user.id if user else None, action, sent_at):
+        logger.info(f"Dropped duplicate update {update.update_id} ({action!r}) from user {user.id if user else None}.")
+        if update.callback_query:
+            # Stops the button's loading spinner; not awaited, so dropping stays cheap.
+            context.application.create_task(update.callback_query.answer(), update=update)
+        raise ApplicationHandlerStop
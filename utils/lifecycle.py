@@ -0,0 +1,136 @@
+"""
+Process lifecycle helpers: graceful shutdown on SIGTERM and warm restart.
+
+Render sends SIGTERM on every redeploy. Instead of dying mid-update, the bot
+stops taking new updates, lets in-flight handlers finish, saves pending break
+reminders into bot_data (so PicklePersistence writes them out) and only then
+exits. On the next boot the reminders are rescheduled before polling starts.
+"""
+import asyncio
+import logging
+import signal
+
+from telegram.ext import Application
+
+from utils import broadcast
+from utils.time_utils import get_current_time
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+DRAIN_TIMEOUT_SECONDS = 10
+REMINDER_JOB_PREFIX = 'break_warning_'
+REMINDER_SNAPSHOT_KEY = 'pending_reminders'
+# Reminders that became due while the bot was down are still sent if they are
+# at most this late; older ones are dropped because they are no longer useful.
+REMINDER_RESTORE_GRACE_SECONDS = 60
+
+
+def install_signal_handlers(stop_event: asyncio.Event) -> None:
+    """Sets stop_event when the process receives SIGTERM or SIGINT."""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            # add_signal_handler is not available on Windows event loops.
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop_event.set))
+    logger.info("Signal handlers installed for graceful shutdown.")
+
+
+def snapshot_reminders(application: Application) -> int:
+    """Stores all pending break reminders in bot_data so they survive a restart."""
+    reminders = []
+    for job in application.job_queue.jobs():
+        if not job.name or not job.name.startswith(REMINDER_JOB_PREFIX):
+            continue
+        if job.removed or job.next_t is None:
+            continue
+        reminders.append({
+            'name': job.name,
+            'data': job.data,
+            'due': job.next_t.timestamp(),
+        })
+
+    application.bot_data[REMINDER_SNAPSHOT_KEY] = reminders
+    logger.info(f"Saved {len(reminders)} pending reminder(s) for the next start.")
+    return len(reminders)
+
+
+async def restore_reminders(application: Application, callback) -> int:
+    """
+    Reschedules reminders saved by snapshot_reminders() during the last shutdown.
+    Must run before polling starts, and only restores a reminder if its user is still on a break.
+    """
+    reminders = application.bot_data.pop(REMINDER_SNAPSHOT_KEY, None) or []
+    now = get_current_time().timestamp()
+    restored = 0
+
+    for reminder in reminders:
+        try:
+            user_id = int(reminder['name'][len(REMINDER_JOB_PREFIX):])
+            if not application.user_data.get(user_id, {}).get('on_break'):
+                logger.info(f"Dropping reminder {reminder['name']}: user is no longer on a break.")
+                continue
+            delay = reminder['due'] - now
+            if delay < -REMINDER_RESTORE_GRACE_SECONDS:
+                logger.info(f"Dropping stale reminder {reminder['name']} (overdue by {int(-delay)}s).")
+                continue
+            application.job_queue.run_once(
+                callback,
+                max(delay, 0),
+                data=reminder['data'],
+                name=reminder['name']
+            )
+            restored += 1
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Could not restore reminder {reminder!r}: {e}")
+
+    if reminders:
+        logger.info(f"Restored {restored} of {len(reminders)} saved reminder(s).")
+    return restored
+
+
+def _discard_queued_updates(application: Application) -> int:
+    """Removes updates that were fetched but not yet picked up by a handler. Returns how many."""
+    dropped = 0
+    while True:
+        try:
+            application.update_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return dropped
+        application.update_queue.task_done()
+        dropped += 1
+
+
+async def shutdown(application: Application) -> None:
+    """
+    Stops the bot in order: stop intake, drain handlers, cancel broadcasts, snapshot reminders, stop.
+    Queued updates get DRAIN_TIMEOUT_SECONDS; after that the rest are dropped and only
+    the ones already being handled are waited for. Persistence is flushed afterwards
+    by application.shutdown().
+    """
+    logger.info("Shutdown requested. Stopping update intake...")
+    if application.updater and application.updater.running:
+        await application.updater.stop()
+
+    logger.info("Draining in-flight updates...")
+    try:
+        await asyncio.wait_for(application.update_queue.join(), timeout=DRAIN_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        # application.stop() would otherwise process every queued update before returning.
+        dropped = _discard_queued_updates(application)
+        logger.warning(f"Updates still pending after {DRAIN_TIMEOUT_SECONDS}s; dropped {dropped} queued update(s).")
+        # Only the update(s) already being handled are left; their reminders must make the snapshot.
+        await application.update_queue.join()
+
+    # Running broadcasts would otherwise keep going for as long as the fan-out takes.
+    await broadcast.cancel_running()
+
+    # Must happen before application.stop(), which shuts down the JobQueue.
+    snapshot_reminders(application)
+
+    if application.running:
+        await application.stop()
+    logger.info("Bot stopped. Persistence will be flushed by application.shutdown().")
@@ -0,0 +1,184 @@
+"""
+Byte-offset indexes over the activity CSV for fast historical queries.
+
+Two append-only index files sit next to the log:
+  - USER_INDEX_FILE: one "offset,user_id,shift_date,username" line per log row
+  - LATE_INDEX_FILE: one "offset,shift_date" line per late check-in
+They are loaded once per process and then only extended with rows appended to
+the log since the last refresh, so a query never rescans the whole CSV. A page
+of results is read by seeking straight to the offsets it needs.
+"""
+import csv
+import logging
+import os
+
+from utils.logger import LOG_FILE
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+USER_INDEX_FILE = LOG_FILE + '.users.idx'
+LATE_INDEX_FILE = LOG_FILE + '.late.idx'
+
+# --- State ---
+_index = None
+
+
+def _empty_index() -> dict:
+    """Returns a new, empty in-memory index."""
+    return {
+        'size': 0,       # Bytes of LOG_FILE covered by the index
+        'users': {},     # user_id -> [(offset, shift_date), ...] in log order
+        'late': {},      # shift_date -> [offset, ...] in log order
+        'names': {},     # lowercase username -> user_id
+        'last_offset': None,
+        'last_user_id': None,
+    }
+
+
+def _parse_line(raw: bytes):
+    """Parses one raw CSV line into a row, or returns None for headers and broken lines."""
+    try:
+        row = next(csv.reader([raw.decode('utf-8')]))
+    except (UnicodeDecodeError, StopIteration, csv.Error):
+        return None
+    if len(row) < 6 or row[0] == 'timestamp_utc':
+        return None
+    return row
+
+
+def _remember(index: dict, offset: int, user_id: str, shift_date: str, username: str):
+    """Adds one log row to the in-memory index."""
+    index['users'].setdefault(user_id, []).append((offset, shift_date))
+    if username:
+        index['names'][username.lower()] = user_id
+    index['last_offset'] = offset
+    index['last_user_id'] = user_id
+
+
+def _is_late_checkin(row: list) -> bool:
+    """True for start_work rows that were logged as late."""
+    return row[3] == 'start_work' and row[4].startswith('Checked in late')
+
+
+def _read_line_at(offset: int) -> bytes:
+    """Reads the raw log line starting at offset."""
+    with open(LOG_FILE, 'rb') as f:
+        f.seek(offset)
+        return f.readline()
+
+
+def _load() -> dict:
+    """Loads the index files and checks that they still describe the current log."""
+    if not os.path.exists(USER_INDEX_FILE) or not os.path.exists(LOG_FILE):
+        return _reset()
+
+    index = _empty_index()
+    try:
+        with open(USER_INDEX_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                offset, user_id, shift_date, username = line.rstrip('\n').split(',', 3)
+                _remember(index, int(offset), user_id, shift_date, username)
+        if os.path.exists(LATE_INDEX_FILE):
+            with open(LATE_INDEX_FILE, 'r', encoding='utf-8') as f:
+                for line in f:
+                    offset, shift_date = line.rstrip('\n').split(',', 1)
+                    index['late'].setdefault(shift_date, []).append(int(offset))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Log index is unreadable ({e}); rebuilding it.")
+        return _reset()
+
+    if index['last_offset'] is not None:
+        # The index ends right after the last row it knows about.
+        last_line = _read_line_at(index['last_offset'])
+        row = _parse_line(last_line)
+        if row is None or row[1] != index['last_user_id']:
+            logger.warning("Log index does not match the log file; rebuilding it.")
+            return _reset()
+        index['size'] = index['last_offset'] + len(last_line)
+    return index
+
+
+def _reset() -> dict:
+    """Deletes the index files and returns an empty index."""
+    for path in (USER_INDEX_FILE, LATE_INDEX_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    return _empty_index()
+
+
+def refresh() -> dict:
+    """Brings the index up to date with rows appended to the log since the last call."""
+    global _index
+    if _index is None:
+        _index = _load()
+
+    if not os.path.exists(LOG_FILE):
+        return _index
+
+    size = os.path.getsize(LOG_FILE)
+    if size < _index['size']:
+        logger.warning("Log file shrank; rebuilding the log index.")
+        _index = _reset()
+    if size == _index['size']:
+        return _index
+
+    user_lines = []
+    late_lines = []
+    offset = _index['size']
+    with open(LOG_FILE, 'rb') as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break  # A row is being written right now; pick it up next time.
+            row = _parse_line(raw)
+            if row is not None:
+                user_id, username, shift_date = row[1], row[2], row[5]
+                _remember(_index, offset, user_id, shift_date, username)
+                user_lines.append(f"{offset},{user_id},{shift_date},{username}\n")
+                if _is_late_checkin(row):
+                    _index['late'].setdefault(shift_date, []).append(offset)
+                    late_lines.append(f"{offset},{shift_date}\n")
+            offset += len(raw)
+    _index['size'] = offset
+
+    with open(USER_INDEX_FILE, 'a', encoding='utf-8') as f:
+        f.writelines(user_lines)
+    with open(LATE_INDEX_FILE, 'a', encoding='utf-8') as f:
+        f.writelines(late_lines)
+
+    logger.info(f"Log index updated with {len(user_lines)} new row(s).")
+    return _index
+
+
+def resolve_user(query: str):
+    """Returns the user_id (as a string) for a numeric ID or a username, or None if unknown."""
+    index = refresh()
+    query = query.strip().lstrip('@')
+    if query in index['users']:
+        return query
+    return index['names'].get(query.lower())
+
+
+def user_history(user_id: str, since_date: str) -> list:
+    """Offsets of the user's rows with shift_date >= since_date ('YYYY-MM-DD'), newest first."""
+    entries = refresh()['users'].get(user_id, [])
+    return [offset for offset, shift_date in reversed(entries) if shift_date >= since_date]
+
+
+def late_checkins(shift_date: str) -> list:
+    """Offsets of the late check-ins recorded for the given shift date ('YYYY-MM-DD')."""
+    return list(refresh()['late'].get(shift_date, []))
+
+
+def read_rows(offsets: list) -> list:
+    """Reads only the rows at the given offsets."""
+    rows = []
+    with open(LOG_FILE, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            row = _parse_line(f.readline())
+            if row is not None:
+                rows.append(row)
+    return rows
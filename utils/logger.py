@@ -1,10 +1,15 @@
 import csv
+import logging
 import os
 from datetime import datetime
 from telegram import User
 
+from utils import anomaly
 from utils.time_utils import get_current_time, get_shift_date
 
+# Configure logging
+logger = logging.getLogger(__name__)
+
 # --- Constants ---
 LOG_FILE = 'work_tracker_log.csv'
 LOG_HEADER = ['timestamp_utc', 'user_id', 'username', 'event', 'details', 'shift_date']
@@ -33,6 +38,13 @@ def log_activity(user: User, event: str, details: str):
         with open(LOG_FILE, 'a', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
             writer.writerow(log_entry)
+
+        # Feed the event to the streaming anomaly rules (constant time per event).
+        # The row is already written, so a failure here must not be reported as a write error.
+        try:
+            anomaly.observe(user.id, log_entry[2], event, details, now, shift_date_str)
+        except Exception as e:
+            logger.error(f"Anomaly detection failed for {event} by user {user.id}: {e}")
             
     except Exception as e:
         print(f"Error writing to log file: {e}")
@@ -0,0 +1,70 @@
+"""
+Startup timing and profiling.
+
+This module only uses the standard library so main.py can import it before
+anything heavy. Set STARTUP_PROFILE=1 to log how long each import and
+initialization step took. The time from boot to the first answered update is
+always measured and kept in bot_data so it can be compared across deploys.
+"""
+import importlib
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+BOOT_TIME = time.perf_counter()
+PROFILE_ENABLED = os.getenv('STARTUP_PROFILE', '').strip().lower() in ('1', 'true', 'yes')
+HISTORY_KEY = 'startup_history'
+MAX_HISTORY = 20
+
+# --- State ---
+_timings = []
+_first_update_seen = False
+
+
+def elapsed() -> float:
+    """Seconds since this module was imported (i.e. since boot started)."""
+    return time.perf_counter() - BOOT_TIME
+
+
+@contextmanager
+def timed(label: str):
+    """Records how long the wrapped block took under the given label."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings.append((label, time.perf_counter() - started))
+
+
+def import_module(name: str):
+    """Imports a module by name and records the time it took."""
+    with timed(f"import {name}"):
+        return importlib.import_module(name)
+
+
+def report() -> None:
+    """Logs every recorded step, slowest first. Does nothing unless profiling is enabled."""
+    if not PROFILE_ENABLED:
+        return
+    logger.info(f"Startup profile ({elapsed() * 1000:.1f} ms since boot):")
+    for label, duration in sorted(_timings, key=lambda item: item[1], reverse=True):
+        logger.info(f"  {duration * 1000:8.1f} ms  {label}")
+
+
+def record_first_update(bot_data: dict) -> None:
+    """Stores the cold-start time the first time it is called; later calls are ignored."""
+    global _first_update_seen
+    if _first_update_seen:
+        return
+    _first_update_seen = True
+
+    cold_start = elapsed()
+    history = bot_data.setdefault(HISTORY_KEY, [])
+    history.append({'recorded_at': time.time(), 'first_update_seconds': round(cold_start, 3)})
+    del history[:-MAX_HISTORY]
+    logger.info(f"First update answered {cold_start * 1000:.0f} ms after boot.")
@@ -0,0 +1,6 @@
+"""
+Conversation states shared by main.py and all handlers.
+"""
+
+# --- State Definitions for ConversationHandler ---
+SELECTING_ACTION, ON_BREAK, CONFIRM_OFF_WORK = range(3)
@@ -4,8 +4,19 @@ from datetime import datetime, timedelta
 # --- Constants ---
 TIMEZONE = pytz.timezone('Asia/Bangkok')
 
+# Optional replacement clock (a callable returning an aware datetime), used by
+# tests/simulation.py to drive the handlers under a virtual clock.
+_clock = None
+
+def set_clock(clock) -> None:
+    """Replaces the clock used by get_current_time(). Pass None to restore the real one."""
+    global _clock
+    _clock = clock
+
 def get_current_time() -> datetime:
     """Returns the current time in the specified timezone."""
+    if _clock is not None:
+        return _clock()
     return datetime.now(TIMEZONE)
 
 def get_shift_date() -> datetime: